@@ -1,6 +1,8 @@
 # bot.py – 3×3 Blindfold Trainer with global Stats & Exit
-import os, random
-from typing import List
+import asyncio, json, logging, operator, os, pickle, queue, random
+from logging.handlers import QueueHandler, QueueListener
+from dataclasses import dataclass, field, fields
+from typing import Awaitable, Dict, List, Optional, Sequence
 
 from telegram import (
     Update,
@@ -12,11 +14,13 @@ from telegram import (
 )
 from telegram.ext import (
     Application,
+    BasePersistence,
+    BaseUpdateProcessor,
     CallbackQueryHandler,
     CommandHandler,
     ContextTypes,
-    ConversationHandler,
     MessageHandler,
+    PersistenceInput,
     PicklePersistence,
     filters,
 )
@@ -25,7 +29,13 @@ from telegram.ext import (
 CORNER_LETTERS = list("ABCDEFGH")
 EDGE_LETTERS   = list("IJKLMNOPQRST")
 DUP_CHANCE     = 0.15
+PERSIST_EVERY  = 60  # seconds between persistence writes
 
+_RND = random.Random()
+_choices, _randint = _RND.choices, _RND.randint
+
+# conversation steps, kept in UserState.step
+IDLE = -1
 SHOW_MEMO, WAIT_MATH, WAIT_RECALL_EDGES, WAIT_RECALL_CORNERS = range(4)
 
 # 🧠 to start, 🛑 to exit, 📊 for stats
@@ -33,112 +43,313 @@ MAIN_KB = ReplyKeyboardMarkup(
     [[KeyboardButton("🧠"), KeyboardButton("🛑"), KeyboardButton("📊")]],
     resize_keyboard=True,
 )
+LETSGO_KB = InlineKeyboardMarkup.from_button(
+    InlineKeyboardButton("Let’s go", callback_data="letsgo")
+)
+MD = constants.ParseMode.MARKDOWN
+# send kwargs shared by every screen that shows the main keyboard
+MAIN_OPTS = {"parse_mode": MD, "reply_markup": MAIN_KB}
+NEXT_FOOTER = "Press 🧠 for next, 🛑 to quit, 📊 for stats."
+
+@dataclass(slots=True)
+class UserState:
+    """Everything the bot remembers about one user, kept in user_data["s"]."""
+    level: int = 1
+    corner_len: int = 3
+    edge_len: int = 5
+    msg_id: Optional[int] = None
+    last_hash: Optional[int] = None
+    correct_letters: int = 0
+    attempted_letters: int = 0
+    puzzles_solved: int = 0
+    edges: List[str] = field(default_factory=list)
+    corners: List[str] = field(default_factory=list)
+    math_ans: int = 0
+    last_edge_hits: int = 0
+    # next round's memos, generated once the previous round is answered
+    next_edges: List[str] = field(default_factory=list)
+    next_corners: List[str] = field(default_factory=list)
+    step: int = IDLE
+
+    def __setstate__(self, state):
+        # states pickled before a field existed get that field's default
+        self.__init__()
+        for k, v in state[1].items():
+            setattr(self, k, v)
+
+STATE_FIELDS = {f.name for f in fields(UserState)}
+
+def user_state(ctx: ContextTypes.DEFAULT_TYPE) -> UserState:
+    """Return the user's state, creating it (from older flat keys) if missing."""
+    ud = ctx.user_data
+    s = ud.get("s")
+    if s is None:
+        s = ud["s"] = UserState(**{k: ud.pop(k) for k in STATE_FIELDS & ud.keys()})
+    return s
 
 def rint(a: int, b: int) -> int:
-    return random.randint(a, b)
+    return _randint(a, b)
 
 def next_len(n: int, maxn: int, minrnd: int) -> int:
     return n + 1 if n < maxn else rint(minrnd, maxn)
 
 def gen_memo_set(letters: List[str], length: int) -> List[str]:
+    """Never repeat the first/last letter; reuse others with DUP_CHANCE weight."""
     memo: List[str] = []
-    while len(memo) < length:
-        L = random.choice(letters)
-        if memo and (L == memo[0] or L == memo[-1]):
-            continue
-        if L in memo and random.random() > DUP_CHANCE:
-            continue
-        memo.append(L)
+    for _ in range(length):
+        pool = [L for L in letters if not memo or L not in (memo[0], memo[-1])]
+        weights = [DUP_CHANCE if L in memo else 1 for L in pool]
+        memo += _choices(pool, weights)
     return memo
 
-def format_feedback(correct: List[str], guess: List[str]):
-    c_txt, g_txt = [], []
-    hits = 0
-    for c, g in zip(correct, guess):
-        if c == g:
-            hits += 1
-            c_txt.append(f"`{c.lower()}`")
-            g_txt.append(f"`{g.lower()}`")
-        else:
-            c_txt.append(f"*{c}*")
-            g_txt.append(f"*{(g or '·').upper()}*")
+def bump_acc(s: UserState, hits: int, total: int) -> int:
+    """Add a recall to the running letter score, return accuracy in %."""
+    s.correct_letters   += hits
+    s.attempted_letters += total
+    return s.correct_letters * 100 // s.attempted_letters
+
+def format_feedback(correct: Sequence[str], guess: Sequence[str]):
+    mask = list(map(operator.eq, correct, guess))
+    hits = sum(mask)
+    c_txt = " ".join(f"`{c.lower()}`" if ok else f"*{c}*" for c, ok in zip(correct, mask))
+    g_txt = " ".join(f"`{g.lower()}`" if ok else f"*{(g or '·').upper()}*" for g, ok in zip(guess, mask))
     return (
-        f"*Correct*: {' '.join(c_txt)}\n"
-        f"*Yours  *: {' '.join(g_txt)}\n"
+        f"*Correct*: {c_txt}\n"
+        f"*Yours  *: {g_txt}\n"
         f"*Score  *: {hits}/{len(correct)}",
         hits,
     )
 
 async def send_new(chat_id: int, ctx: ContextTypes.DEFAULT_TYPE, text: str, **kwargs):
-    """Delete old bot msg and send a new one, store its ID."""
-    prev = ctx.user_data.get("msg_id")
-    if prev:
-        try: await ctx.bot.delete_message(chat_id, prev)
-        except: pass
-    msg = await ctx.bot.send_message(chat_id, text, **kwargs)
-    ctx.user_data["msg_id"] = msg.message_id
+    """Delete old bot msg and send a new one, store its ID.
+
+    Both requests are in flight at the same time; a failed delete is ignored.
+    If the previous message is still shown with the same content, nothing is
+    sent and None is returned.
+    """
+    s = user_state(ctx)
+    prev = s.msg_id
+    key = hash((text, id(kwargs.get("reply_markup"))))
+    if prev and s.last_hash == key:
+        return None
+    delete = asyncio.create_task(ctx.bot.delete_message(chat_id, prev)) if prev else None
+    try:
+        msg = await ctx.bot.send_message(chat_id, text, **kwargs)
+    finally:
+        if delete:
+            await asyncio.gather(delete, return_exceptions=True)
+    s.msg_id, s.last_hash = msg.message_id, key
     return msg
 
+# ───────── Persistence ─────────
+class RedisPersistence(BasePersistence):
+    """user_data in Redis: one hash `user:{id}`, one pickled field per key.
+
+    A UserState is split into one field per attribute (`s.level`, ...).
+    A snapshot of what Redis holds is kept in memory, so each write only
+    sends the fields that actually changed instead of the whole dataset.
+    """
+
+    def __init__(self, redis, update_interval: float = 60):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.redis = redis
+        self._snapshot: Dict[int, Dict[str, bytes]] = {}
+
+    async def get_user_data(self) -> Dict[int, Dict]:
+        keys = [key async for key in self.redis.scan_iter(match="user:*")]
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.hgetall(key)
+            hashes = await pipe.execute()
+        data = {}
+        for key, raw in zip(keys, hashes):
+            uid = int(key.split(b":", 1)[1])
+            self._snapshot[uid] = {f.decode(): v for f, v in raw.items()}
+            data[uid] = self._load(self._snapshot[uid])
+        return data
+
+    @staticmethod
+    def _dump(data: Dict) -> Dict[str, bytes]:
+        fields_ = {}
+        for k, v in data.items():
+            if isinstance(v, UserState):
+                fields_.update({f"{k}.{f}": pickle.dumps(getattr(v, f)) for f in STATE_FIELDS})
+            else:
+                fields_[k] = pickle.dumps(v)
+        return fields_
+
+    @staticmethod
+    def _load(raw: Dict[str, bytes]) -> Dict:
+        data: Dict = {}
+        states: Dict[str, Dict] = {}
+        for k, v in raw.items():
+            key, dot, attr = k.partition(".")
+            if dot:
+                states.setdefault(key, {})[attr] = pickle.loads(v)
+            else:
+                data[k] = pickle.loads(v)
+        for key, attrs in states.items():
+            data[key] = UserState(**{a: v for a, v in attrs.items() if a in STATE_FIELDS})
+        return data
+
+    async def update_user_data(self, user_id: int, data: Dict) -> None:
+        fresh = self._dump(data)
+        old = self._snapshot.get(user_id, {})
+        changed = {k: v for k, v in fresh.items() if old.get(k) != v}
+        removed = [k for k in old if k not in fresh]
+        if not changed and not removed:
+            return
+        async with self.redis.pipeline(transaction=True) as pipe:
+            if changed:
+                pipe.hset(f"user:{user_id}", mapping=changed)
+            if removed:
+                pipe.hdel(f"user:{user_id}", *removed)
+            await pipe.execute()
+        self._snapshot[user_id] = fresh
+
+    async def drop_user_data(self, user_id: int) -> None:
+        await self.redis.delete(f"user:{user_id}")
+        self._snapshot.pop(user_id, None)
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict) -> None:
+        pass
+
+    async def get_conversations(self, name: str) -> Dict:
+        raw = await self.redis.hgetall(f"conv:{name}")
+        return {tuple(json.loads(k)): json.loads(v) for k, v in raw.items()}
+
+    async def update_conversation(self, name: str, key, new_state: Optional[object]) -> None:
+        field = json.dumps(key)
+        if new_state is None:
+            await self.redis.hdel(f"conv:{name}", field)
+        else:
+            await self.redis.hset(f"conv:{name}", field, json.dumps(new_state))
+
+    async def flush(self) -> None:
+        await self.redis.aclose()
+
+    # chat_data, bot_data and callback_data are not used by the bot
+    async def get_chat_data(self) -> Dict[int, Dict]:
+        return {}
+
+    async def get_bot_data(self) -> Dict:
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def update_chat_data(self, chat_id: int, data: Dict) -> None:
+        pass
+
+    async def update_bot_data(self, data: Dict) -> None:
+        pass
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: Dict) -> None:
+        pass
+
+# ───────── Update processing ─────────
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    """Process updates concurrently across chats, but in order within a chat.
+
+    A chat's updates drive its conversation state, so they must not overlap;
+    different chats are independent and no longer wait on each other.
+    """
+
+    def __init__(self, max_concurrent_updates: int = 256):
+        super().__init__(max_concurrent_updates)
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._queued: Dict[int, int] = {}  # updates holding or awaiting a lock
+
+    async def process_update(self, update: object, coroutine: Awaitable) -> None:
+        # the chat lock is taken before the shared semaphore, so updates queued
+        # behind a busy chat don't use up slots the other chats need
+        chat = update.effective_chat if isinstance(update, Update) else None
+        if chat is None:
+            await super().process_update(update, coroutine)
+            return
+        lock = self._locks.setdefault(chat.id, asyncio.Lock())
+        self._queued[chat.id] = self._queued.get(chat.id, 0) + 1
+        try:
+            async with lock:
+                await super().process_update(update, coroutine)
+        finally:
+            self._queued[chat.id] -= 1
+            if not self._queued[chat.id]:
+                del self._queued[chat.id], self._locks[chat.id]
+
+    async def do_process_update(self, update: object, coroutine: Awaitable) -> None:
+        await coroutine
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
 # ───────── Handlers ─────────
 async def start(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     """/start → welcome screen."""
-    ctx.user_data.update(
-        level=1,
-        corner_len=3,
-        edge_len=5,
-        msg_id=None,
-        correct_letters=0,
-        attempted_letters=0,
-        puzzles_solved=0,
-    )
+    ud = ctx.user_data
+    for k in STATE_FIELDS & ud.keys():  # flat keys of the old layout
+        del ud[k]
+    ud["s"] = UserState()
     await send_new(
         update.effective_chat.id,
         ctx,
         "👋 *Welcome to the 3×3 blind trainer*\n\n"
         "Press 🧠 to generate edge & corner strings,\n"
         "🛑 to exit, or 📊 for stats.",
-        parse_mode=constants.ParseMode.MARKDOWN,
-        reply_markup=MAIN_KB,
+        **MAIN_OPTS,
     )
-    return ConversationHandler.END
 
 async def go_handler(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     """🧠 → show edges & corners with ‘Let’s go’ button."""
     chat = update.effective_chat.id
-    cl = ctx.user_data["corner_len"]
-    el = ctx.user_data["edge_len"]
-    corners = gen_memo_set(CORNER_LETTERS, cl)
-    edges   = gen_memo_set(EDGE_LETTERS, el)
-    ctx.user_data.update(corners=corners, edges=edges)
-
-    kb = InlineKeyboardMarkup.from_button(
-        InlineKeyboardButton("Let’s go", callback_data="letsgo")
-    )
+    s = user_state(ctx)
+    cl, el = s.corner_len, s.edge_len
+    corners = s.corners = s.next_corners or gen_memo_set(CORNER_LETTERS, cl)
+    edges   = s.edges   = s.next_edges   or gen_memo_set(EDGE_LETTERS, el)
+    s.next_corners, s.next_edges = [], []
+    s.step = SHOW_MEMO
+
     await send_new(
         chat, ctx,
-        f"*Level {ctx.user_data['level']}*\n"
+        f"*Level {s.level}*\n"
         f"Edges ({el}): `{' '.join(edges)}`\n"
         f"Corners ({cl}): `{' '.join(corners)}`",
-        parse_mode=constants.ParseMode.MARKDOWN,
-        reply_markup=kb,
+        parse_mode=MD,
+        reply_markup=LETSGO_KB,
     )
-    return SHOW_MEMO
 
 async def letsgo_cb(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     """Inline ‘Let’s go’ → distraction math."""
     await update.callback_query.answer()
+    s = user_state(ctx)
+    if s.step != SHOW_MEMO:  # button of an older round
+        return
     chat = update.effective_chat.id
     a, b = rint(1000, 9999), rint(1000, 9999)
-    ctx.user_data["math_ans"] = a + b
+    s.math_ans = a + b
+    s.step = WAIT_MATH
 
     await send_new(
         chat, ctx,
         "🧮 *Distraction task*\n"
         f"`{a} + {b} = ?`\n\nSend the answer.",
-        parse_mode=constants.ParseMode.MARKDOWN,
-        reply_markup=MAIN_KB,
+        **MAIN_OPTS,
     )
-    return WAIT_MATH
 
 async def handle_math(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     """Math answer → verdict + prompt for edges."""
@@ -147,135 +358,169 @@ async def handle_math(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
         val = int(update.message.text.strip())
     except ValueError:
         await update.message.reply_text("❌ Send a valid number.")
-        return WAIT_MATH
+        return
 
-    ok = val == ctx.user_data["math_ans"]
-    verdict = "✅ Correct!" if ok else f"❌ Incorrect (was {ctx.user_data['math_ans']})"
+    s = user_state(ctx)
+    ans = s.math_ans
+    s.step = WAIT_RECALL_EDGES
+    verdict = "✅ Correct!" if val == ans else f"❌ Incorrect (was {ans})"
     await send_new(
         chat, ctx,
         verdict + "\n\nNow send the *edges* string.",
-        parse_mode=constants.ParseMode.MARKDOWN,
-        reply_markup=MAIN_KB,
+        **MAIN_OPTS,
     )
-    return WAIT_RECALL_EDGES
 
 async def handle_edges(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     """Edges recall → feedback + prompt corners."""
     chat = update.effective_chat.id
-    edges = ctx.user_data["edges"]
+    s = user_state(ctx)
+    edges = s.edges
+    n = len(edges)
     guess = update.message.text.strip().upper()
-    if len(guess) != len(edges):
-        await update.message.reply_text(f"Need {len(edges)} letters for edges.")
-        return WAIT_RECALL_EDGES
+    if len(guess) != n:
+        await update.message.reply_text(f"Need {n} letters for edges.")
+        return
 
-    fb, hits = format_feedback(edges, list(guess))
-    ctx.user_data["correct_letters"]   += hits
-    ctx.user_data["attempted_letters"] += len(edges)
-    ctx.user_data["last_edge_hits"]     = hits
+    fb, hits = format_feedback(edges, guess)
+    bump_acc(s, hits, n)
+    s.last_edge_hits = hits
+    s.step = WAIT_RECALL_CORNERS
 
     await send_new(
         chat, ctx,
         fb + "\n\nNow send the *corners* string.",
-        parse_mode=constants.ParseMode.MARKDOWN,
-        reply_markup=MAIN_KB,
+        **MAIN_OPTS,
     )
-    return WAIT_RECALL_CORNERS
 
 async def handle_corners(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     """Corners recall → final feedback + stats + back to main."""
     chat = update.effective_chat.id
-    corners = ctx.user_data["corners"]
+    s = user_state(ctx)
+    corners = s.corners
+    n = len(corners)
     guess   = update.message.text.strip().upper()
-    if len(guess) != len(corners):
-        await update.message.reply_text(f"Need {len(corners)} letters for corners.")
-        return WAIT_RECALL_CORNERS
-
-    fb, hits = format_feedback(corners, list(guess))
-    ctx.user_data["correct_letters"]   += hits
-    ctx.user_data["attempted_letters"] += len(corners)
+    if len(guess) != n:
+        await update.message.reply_text(f"Need {n} letters for corners.")
+        return
 
+    fb, hits = format_feedback(corners, guess)
     # full solve = perfect edges + perfect corners
-    if (hits == len(corners)
-        and ctx.user_data.get("last_edge_hits",0) == len(ctx.user_data["edges"])):
-        ctx.user_data["puzzles_solved"] += 1
-
-    acc = ctx.user_data["correct_letters"] * 100 // ctx.user_data["attempted_letters"]
+    if hits == n and s.last_edge_hits == len(s.edges):
+        s.puzzles_solved += 1
+    acc = bump_acc(s, hits, n)
+    cl, el = s.corner_len, s.edge_len
+    s.level     += 1
+    s.corner_len = cl = next_len(cl, len(CORNER_LETTERS), 3)
+    s.edge_len   = el = next_len(el, len(EDGE_LETTERS),   5)
+    s.step = IDLE
 
     await send_new(
         chat, ctx,
         fb
         + f"\n\n🎯 *{acc}%* accuracy\n"
-        f"🎉 *{ctx.user_data['puzzles_solved']}* full solves\n\n"
-        "Press 🧠 for next, 🛑 to quit, 📊 for stats.",
-        parse_mode=constants.ParseMode.MARKDOWN,
-        reply_markup=MAIN_KB,
+        f"🎉 *{s.puzzles_solved}* full solves\n\n"
+        + NEXT_FOOTER,
+        **MAIN_OPTS,
     )
-
-    ctx.user_data["level"]      += 1
-    ctx.user_data["corner_len"] = next_len(ctx.user_data["corner_len"], len(CORNER_LETTERS), 3)
-    ctx.user_data["edge_len"]   = next_len(ctx.user_data["edge_len"],   len(EDGE_LETTERS),   5)
-    return ConversationHandler.END
+    # reply is out; prepare the next round while the user reads it
+    s.next_corners = gen_memo_set(CORNER_LETTERS, cl)
+    s.next_edges   = gen_memo_set(EDGE_LETTERS, el)
 
 async def exit_handler(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
-    """🛑 → always say goodbye."""
+    """🛑 → always say goodbye and leave the current round."""
+    user_state(ctx).step = IDLE
     await send_new(
         update.effective_chat.id, ctx,
         "👋 *Goodbye!* Come back anytime with 🧠.",
-        parse_mode=constants.ParseMode.MARKDOWN,
-        reply_markup=MAIN_KB,
+        **MAIN_OPTS,
     )
-    return ConversationHandler.END
 
 async def stats_handler(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     """📊 → always show stats."""
-    solved = ctx.user_data.get("puzzles_solved", 0)
+    solved = user_state(ctx).puzzles_solved
     await send_new(
         update.effective_chat.id, ctx,
         f"📊 You’ve full‑solved *{solved}* cubes.",
-        parse_mode=constants.ParseMode.MARKDOWN,
-        reply_markup=MAIN_KB,
+        **MAIN_OPTS,
     )
 
+# text messages are read by the handler of the step the user is in
+TEXT_HANDLERS = {
+    WAIT_MATH: handle_math,
+    WAIT_RECALL_EDGES: handle_edges,
+    WAIT_RECALL_CORNERS: handle_corners,
+}
+
+async def route_text(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
+    """Text → handler for the current step; 🧠 starts a round when idle."""
+    step = user_state(ctx).step
+    if step in TEXT_HANDLERS:
+        await TEXT_HANDLERS[step](update, ctx)
+    elif step == IDLE and update.message.text == "🧠":
+        await go_handler(update, ctx)
+
 # ───────── Main ─────────
+log = logging.getLogger(__name__)
+
+def setup_logging() -> QueueListener:
+    """Log through a queue so handlers never block on writing to stderr."""
+    log_queue: queue.Queue = queue.Queue(-1)
+    stream = logging.StreamHandler()
+    stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    listener = QueueListener(log_queue, stream)
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(QueueHandler(log_queue))
+    logging.getLogger("httpx").setLevel(logging.WARNING)  # one line per API call
+    listener.start()
+    return listener
+
 def main():
     TOKEN = os.getenv("BOT_TOKEN") or exit("Set BOT_TOKEN")
+    REDIS_URL = os.getenv("REDIS_URL")
+    if REDIS_URL:
+        from redis.asyncio import Redis
+        persistence = RedisPersistence(Redis.from_url(REDIS_URL), PERSIST_EVERY)
+    else:
+        persistence = PicklePersistence(
+            "memo3x3_data",
+            store_data=PersistenceInput(bot_data=False, chat_data=False, callback_data=False),
+            update_interval=PERSIST_EVERY,
+        )
+
     app = (
         Application.builder()
         .token(TOKEN)
-        .persistence(PicklePersistence("memo3x3_data"))
+        .http_version("2")
+        .get_updates_http_version("2")
+        .concurrent_updates(PerChatUpdateProcessor())
+        .persistence(persistence)
         .build()
     )
 
-    conv = ConversationHandler(
-        entry_points=[CommandHandler("start", start),
-                      MessageHandler(filters.Regex("^🧠$"), go_handler)],
-        states={
-            SHOW_MEMO: [
-                CallbackQueryHandler(letsgo_cb, pattern="^letsgo$"),
-            ],
-            WAIT_MATH: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND, handle_math),
-            ],
-            WAIT_RECALL_EDGES: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND, handle_edges),
-            ],
-            WAIT_RECALL_CORNERS: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND, handle_corners),
-            ],
-        },
-        fallbacks=[],
-        name="memo3x3_conv",
-        persistent=True,
-    )
+    app.add_handler(CommandHandler("start", start))
+    # Exit & Stats come first so they work in every step
+    app.add_handler(MessageHandler(filters.Text(["🛑"]), exit_handler))
+    app.add_handler(MessageHandler(filters.Text(["📊"]), stats_handler))
+    app.add_handler(CallbackQueryHandler(letsgo_cb, pattern="^letsgo$"))
+    # new messages only: an edit must not count as an answer
+    app.add_handler(MessageHandler(
+        filters.UpdateType.MESSAGE & filters.TEXT & ~filters.COMMAND, route_text
+    ))
 
-    # Global handlers for Exit & Stats
-    app.add_handler(MessageHandler(filters.Regex("^🛑$"), exit_handler))
-    app.add_handler(MessageHandler(filters.Regex("^📊$"), stats_handler))
-
-    app.add_handler(conv)
-
-    print("Bot running… Ctrl‑C to stop.")
-    app.run_polling()
+    try:
+        import uvloop
+    except ImportError:
+        pass
+    else:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+    listener = setup_logging()
+    log.info("Bot running… Ctrl‑C to stop.")
+    try:
+        app.run_polling()
+    finally:
+        listener.stop()
 
 if __name__ == "__main__":
     main()